@@ -1,84 +1,142 @@
+import os
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import BinaryIO, Dict, List, Any, Callable, Optional, Tuple, Union
+
+try:
+    import orjson
+except ImportError:  # orjson - необязательная зависимость, без неё используется стандартный json
+    orjson = None
 
 from utils.exceptions import CloudStorageError
 from utils.logger import setup_logger
+from utils.rate_limiter import RateLimiter
 
 logger = setup_logger(__name__)
 
 
+class RateLimitedSession(requests.Session):
+    """HTTP-сессия, ограничивающая частоту запросов к REST API.
+
+    Ограничение действует только на URL с заданным префиксом: загрузка содержимого
+    файлов идёт на отдельные хосты загрузки и не расходует лимит API.
+    """
+
+    def __init__(self, limiter: Optional[RateLimiter], limited_prefix: str):
+        """
+        Инициализация сессии.
+
+        Args:
+            limiter: Ограничитель частоты запросов (None - без ограничения).
+            limited_prefix: Префикс URL, к которым применяется ограничение.
+        """
+        super().__init__()
+        self.limiter = limiter
+        self.limited_prefix = limited_prefix
+
+    def request(self, method, url, *args, **kwargs):
+        if self.limiter is not None and url.startswith(self.limited_prefix):
+            self.limiter.acquire()
+        return super().request(method, url, *args, **kwargs)
+
+
 class YandexDiskClient:
     """Клиент для работы с Yandex Disk API."""
 
     BASE_URL = 'https://cloud-api.yandex.net/v1/disk'
-
-    def __init__(self, token: str, cloud_folder: str):
+    # Размер пула соединений и число потоков для пакетных операций
+    POOL_SIZE = 32
+    BULK_WORKERS = 16
+    # Частота запросов к REST API по умолчанию; ответы 429 дополнительно
+    # повторяются адаптером с учётом Retry-After
+    REQUESTS_PER_SECOND = 40
+    # Размер буфера чтения файла при потоковой загрузке
+    UPLOAD_BUFFER_SIZE = 1024 * 1024
+    # Поля листинга, которые используются при синхронизации
+    LISTING_FIELDS = ','.join(
+        f'_embedded.items.{field}' for field in ('path', 'type', 'modified', 'size')
+    )
+
+    def __init__(self, token: str, cloud_folder: str, requests_per_second: Optional[float] = None):
         """
         Инициализация клиента.
 
         Args:
             token: OAuth-токен для доступа к Yandex Disk.
             cloud_folder: Папка в облачном хранилище для синхронизации.
+            requests_per_second: Ограничение частоты запросов к REST API
+                                 (None - значение по умолчанию, 0 - без ограничения).
         """
         self.token = token
         self.cloud_folder = cloud_folder
         self.headers = {'Authorization': f'OAuth {token}'}
 
+        # Одна сессия на клиента: соединения переиспользуются (keep-alive),
+        # а временные ошибки 429/5xx повторяются адаптером автоматически
+        # (с учётом заголовка Retry-After)
+        if requests_per_second is None:
+            requests_per_second = self.REQUESTS_PER_SECOND
+        limiter = None
+        if requests_per_second > 0:
+            limiter = RateLimiter(rate=requests_per_second, capacity=max(1, int(requests_per_second)))
+        self.session = RateLimitedSession(limiter, self.BASE_URL)
+        self.session.headers.update(self.headers)
+        # pool_block: при всплеске параллельных запросов поток ждёт свободное
+        # соединение из пула, а не открывает одноразовое с новым TLS-рукопожатием
+        adapter = HTTPAdapter(
+            pool_connections=16,
+            pool_maxsize=self.POOL_SIZE,
+            pool_block=True,
+            max_retries=Retry(
+                total=3,
+                backoff_factor=0.3,
+                status_forcelist=[429, 500, 502, 503, 504],
+                raise_on_status=False
+            )
+        )
+        self.session.mount('https://', adapter)
+
+        # Общий пул потоков для пакетных операций, создаётся один раз на клиента
+        self._executor = ThreadPoolExecutor(max_workers=self.BULK_WORKERS, thread_name_prefix='yandex-disk')
+
         # Проверяем доступность хранилища при инициализации
         self._check_connection()
 
     def _check_connection(self) -> None:
-        """Проверяет доступность облачного хранилища с новыми правами."""
-        try:
-            # Проверяем доступ к API
-            response = requests.get(
-                f'{self.BASE_URL}/',
-                headers=self.headers,
-                timeout=10
-            )
-            response.raise_for_status()
-
-            # Проверяем наличие необходимых возможностей
-            test_operations = [
-                ('GET', f'{self.BASE_URL}/resources', {'path': '/'}),  # Проверка чтения
-                ('PUT', f'{self.BASE_URL}/resources', {'path': f'/{self.cloud_folder}'})  # Проверка записи
-            ]
-
-            for method, url, params in test_operations:
-                test_response = requests.request(
-                    method,
-                    url,
-                    headers=self.headers,
-                    params=params,
-                    timeout=10
-                )
-
-                if test_response.status_code == 403:
-                    required_scope = 'disk.read' if method == 'GET' else 'disk.write'
-                    raise CloudStorageError(
-                        f"Недостаточно прав. Требуется право: cloud_api:disk.{required_scope}"
-                    )
+        """Проверяет доступность облачного хранилища и наличие папки синхронизации.
 
-            # Проверяем существование папки (или создаём)
-            folder_path = f'/{self.cloud_folder}'
-            response = requests.get(
+        Один GET папки синхронизации проверяет токен, право на чтение и
+        существование папки; папка создаётся, только если её нет.
+        """
+        folder_path = f'/{self.cloud_folder}'
+        try:
+            response = self.session.get(
                 f'{self.BASE_URL}/resources',
-                headers=self.headers,
-                params={'path': folder_path},
+                params={'path': folder_path, 'fields': 'path'},
                 timeout=10
             )
+            if response.status_code == 403:
+                raise CloudStorageError("Недостаточно прав. Требуется право: cloud_api:disk.read")
 
             if response.status_code == 404:
-                response = requests.put(
+                response = self.session.put(
                     f'{self.BASE_URL}/resources',
-                    headers=self.headers,
                     params={'path': folder_path},
                     timeout=10
                 )
+                if response.status_code == 403:
+                    raise CloudStorageError("Недостаточно прав. Требуется право: cloud_api:disk.write")
                 response.raise_for_status()
                 logger.info(f"Создана новая папка в облаке: {self.cloud_folder}")
+            else:
+                response.raise_for_status()
 
+        except CloudStorageError:
+            raise
         except requests.HTTPError as e:
             if e.response.status_code == 401:
                 raise CloudStorageError("Неверный токен. Получите новый токен с правами: "
@@ -87,29 +145,56 @@ class YandexDiskClient:
         except Exception as e:
             raise CloudStorageError(f"Неожиданная ошибка: {e}")
 
-    def load(self, file_path: Path, rel_path: str) -> None:
+    def close(self) -> None:
+        """Закрывает HTTP-сессию, пул потоков и освобождает соединения."""
+        self._executor.shutdown(wait=True)
+        self.session.close()
+
+    def load(self, file_path: Union[str, Path], rel_path: str, upload_url: Optional[str] = None) -> None:
         """
         Загружает файл в облачное хранилище с учетом относительного пути.
 
         Args:
             file_path: Полный путь к локальному файлу.
             rel_path: Относительный путь для сохранения в облаке.
+            upload_url: Заранее полученный URL для загрузки (если не указан, будет запрошен).
+        """
+        try:
+            with open(file_path, 'rb', buffering=self.UPLOAD_BUFFER_SIZE) as f:
+                self.load_stream(f, rel_path, os.fstat(f.fileno()).st_size, upload_url)
+        except OSError as e:
+            logger.error(f"Ошибка чтения файла {rel_path}: {e}")
+            raise CloudStorageError(f"Ошибка загрузки файла: {e}")
+
+    def load_stream(self, stream: BinaryIO, rel_path: str, size: Optional[int] = None,
+                    upload_url: Optional[str] = None) -> None:
+        """
+        Загружает в облачное хранилище содержимое открытого файла (потока).
+
+        Тело запроса читается из потока блоками по мере отправки, поэтому в памяти
+        одновременно находится не больше одного буфера, независимо от размера файла.
+
+        Args:
+            stream: Открытый на чтение бинарный поток.
+            rel_path: Относительный путь для сохранения в облаке.
+            size: Размер данных в байтах (передаётся в Content-Length).
+            upload_url: Заранее полученный URL для загрузки (если не указан, будет запрошен).
         """
         try:
             # Получаем URL для загрузки
-            upload_url = self._get_upload_url(rel_path)
+            if upload_url is None:
+                upload_url = self._get_upload_url(rel_path)
 
-            # Загружаем файл
-            with open(file_path, 'rb') as f:
-                response = requests.put(upload_url, files={'file': f})
-                response.raise_for_status()
+            headers = {'Content-Length': str(size)} if size is not None else None
+            response = self.session.put(upload_url, data=stream, headers=headers)
+            response.raise_for_status()
 
             logger.info(f"Файл {rel_path} успешно загружен")
         except Exception as e:
             logger.error(f"Ошибка загрузки файла {rel_path}: {e}")
             raise CloudStorageError(f"Ошибка загрузки файла: {e}")
 
-    def reload(self, file_path: Path, rel_path: str) -> None:
+    def reload(self, file_path: Union[str, Path], rel_path: str) -> None:
         """
         Обновляет файл в облачном хранилище с учетом относительного пути.
 
@@ -127,9 +212,8 @@ class YandexDiskClient:
             file_path: Полный путь к файлу/папке в облаке.
         """
         try:
-            response = requests.delete(
+            response = self.session.delete(
                 f'{self.BASE_URL}/resources',
-                headers=self.headers,
                 params={'path': file_path, 'permanently': True}
             )
             response.raise_for_status()
@@ -138,6 +222,83 @@ class YandexDiskClient:
             logger.error(f"Ошибка удаления объекта {file_path}: {e}")
             raise CloudStorageError(f"Ошибка удаления объекта: {e}")
 
+    def bulk_get_upload_urls(self, rel_paths: List[str]) -> Dict[str, str]:
+        """
+        Параллельно получает URL для загрузки нескольких файлов.
+
+        Args:
+            rel_paths: Относительные пути файлов в облаке.
+
+        Returns:
+            Словарь (относительный путь -> URL для загрузки). Пути, для которых
+            URL получить не удалось, в словарь не попадают.
+        """
+        urls, errors = self._run_bulk(self._get_upload_url, {rel_path: (rel_path,) for rel_path in rel_paths})
+        for rel_path, error in errors.items():
+            logger.error(f"Ошибка получения URL для загрузки {rel_path}: {error}")
+        return urls
+
+    def bulk_load(self, files: List[Tuple[Union[str, Path], str]]) -> Dict[str, Exception]:
+        """
+        Параллельно загружает несколько файлов в облачное хранилище.
+
+        Сначала одним пакетом запрашиваются URL для загрузки, затем
+        содержимое файлов передаётся параллельно.
+
+        Args:
+            files: Список кортежей (полный путь к локальному файлу, относительный путь в облаке).
+
+        Returns:
+            Словарь (относительный путь -> ошибка) для файлов, которые не удалось загрузить.
+        """
+        urls = self.bulk_get_upload_urls([rel_path for _, rel_path in files])
+        _, errors = self._run_bulk(self.load, {
+            rel_path: (file_path, rel_path, urls[rel_path])
+            for file_path, rel_path in files
+            if rel_path in urls
+        })
+        for _, rel_path in files:
+            if rel_path not in urls:
+                errors[rel_path] = CloudStorageError(f"Не удалось получить URL для загрузки {rel_path}")
+        return errors
+
+    def bulk_delete(self, paths: List[str]) -> Dict[str, Exception]:
+        """
+        Параллельно удаляет несколько файлов или папок из облачного хранилища.
+
+        Args:
+            paths: Полные пути к файлам/папкам в облаке.
+
+        Returns:
+            Словарь (путь -> ошибка) для объектов, которые не удалось удалить.
+        """
+        _, errors = self._run_bulk(self.delete, {path: (path,) for path in paths})
+        return errors
+
+    def _run_bulk(self, func: Callable[..., Any],
+                  calls: Dict[str, tuple]) -> Tuple[Dict[str, Any], Dict[str, Exception]]:
+        """Выполняет независимые запросы к API параллельно через общий пул соединений.
+
+            Args:
+                func: Вызываемая функция.
+                calls: Словарь (ключ -> аргументы вызова).
+
+            Returns:
+                Кортеж (результаты успешных вызовов, ошибки неудачных вызовов) по ключам.
+        """
+        results, errors = {}, {}
+        if not calls:
+            return results, errors
+
+        futures = {key: self._executor.submit(func, *args) for key, args in calls.items()}
+
+        for key, future in futures.items():
+            try:
+                results[key] = future.result()
+            except Exception as e:
+                errors[key] = e
+        return results, errors
+
     def get_info(self) -> List[Dict[str, Any]]:
         """
         Получает информацию о файлах в облачном хранилище.
@@ -146,13 +307,12 @@ class YandexDiskClient:
             Список словарей с информацией о файлах.
         """
         try:
-            response = requests.get(
+            response = self.session.get(
                 f'{self.BASE_URL}/resources',
-                headers=self.headers,
                 params={'path': f'/{self.cloud_folder}', 'limit': 1000}
             )
             response.raise_for_status()
-            data = response.json()
+            data = self._parse_json(response)
             return data.get('_embedded', {}).get('items', [])
         except Exception as e:
             logger.error(f"Ошибка получения информации о файлах: {e}")
@@ -171,16 +331,29 @@ class YandexDiskClient:
                 CloudStorageError: Если не удалось получить URL для загрузки.
         """
         try:
-            response = requests.get(
+            response = self.session.get(
                 f'{self.BASE_URL}/resources/upload',
-                headers=self.headers,
                 params={'path': f'/{self.cloud_folder}/{rel_path}', 'overwrite': True}
             )
             response.raise_for_status()
-            return response.json()['href']
+            return self._parse_json(response)['href']
         except Exception as e:
             raise CloudStorageError(f"Ошибка получения URL для загрузки: {e}")
 
+    @staticmethod
+    def _parse_json(response: requests.Response) -> Any:
+        """Разбирает JSON-ответ API, используя orjson, если он установлен.
+
+            Args:
+                response: Ответ HTTP-запроса.
+
+            Returns:
+                Разобранное тело ответа.
+        """
+        if orjson is not None:
+            return orjson.loads(response.content)
+        return response.json()
+
     def create_folder(self, folder_path: str) -> None:
         """
         Создает папку в облачном хранилище.
@@ -191,9 +364,8 @@ class YandexDiskClient:
         """
         try:
             full_path = f'/{self.cloud_folder}/{folder_path}'
-            response = requests.put(
+            response = self.session.put(
                 f'{self.BASE_URL}/resources',
-                headers=self.headers,
                 params={'path': full_path},
                 timeout=10
             )
@@ -218,34 +390,48 @@ class YandexDiskClient:
         """
         Получает рекурсивную информацию о файлах и папках в облачном хранилище.
 
+        Независимые папки запрашиваются параллельно через общий пул потоков.
+        Каждый обход запрашивает все папки заново: дата изменения папки меняется
+        только при изменении её прямого содержимого, поэтому по ней нельзя судить
+        о неизменности вложенных папок.
+
         Returns:
             Список словарей с информацией о файлах и папках.
         """
         try:
             all_items = []
-            stack = [f'/{self.cloud_folder}']
+            pending = {self._executor.submit(self._list_folder, f'/{self.cloud_folder}')}
 
-            while stack:
-                current_path = stack.pop()
-                response = requests.get(
-                    f'{self.BASE_URL}/resources',
-                    headers=self.headers,
-                    params={'path': current_path, 'limit': 1000}
-                )
-                response.raise_for_status()
-                data = response.json()
-                items = data.get('_embedded', {}).get('items', [])
-
-                for item in items:
-                    all_items.append(item)
-                    if item['type'] == 'dir':
-                        stack.append(item['path'])
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    for item in future.result():
+                        all_items.append(item)
+                        if item['type'] == 'dir':
+                            pending.add(self._executor.submit(self._list_folder, item['path']))
 
             return all_items
         except Exception as e:
             logger.error(f"Ошибка получения рекурсивной информации: {e}")
             raise CloudStorageError(f"Ошибка получения рекурсивной информации: {e}")
 
+    def _list_folder(self, folder_path: str) -> List[Dict[str, Any]]:
+        """Получает содержимое одной папки (без вложенных).
+
+            Args:
+                folder_path: Путь к папке в облаке.
+
+            Returns:
+                Список словарей с информацией о файлах и папках.
+        """
+        response = self.session.get(
+            f'{self.BASE_URL}/resources',
+            params={'path': folder_path, 'limit': 1000, 'fields': self.LISTING_FIELDS}
+        )
+        response.raise_for_status()
+        data = self._parse_json(response)
+        return data.get('_embedded', {}).get('items', [])
+
     def rename(self, old_path: str, new_path: str) -> None:
         """Переименовывает файл или папку в облачном хранилище.
     
@@ -257,9 +443,8 @@ class YandexDiskClient:
                 CloudStorageError: Если произошла ошибка при переименовании.
         """
         try:
-            response = requests.post(
+            response = self.session.post(
                 f'{self.BASE_URL}/resources/move',
-                headers=self.headers,
                 params={
                     'from': old_path,
                     'path': new_path,
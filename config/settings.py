@@ -1,16 +1,23 @@
 import configparser
+import os
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Tuple
 
 from utils.exceptions import ConfigError
 from utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
+# Кэш загруженных конфигураций: путь -> (время изменения файла, настройки)
+_config_cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+
 def load_config(config_path: str = 'config.ini') -> Dict[str, Any]:
     """
     Загружает и валидирует конфигурацию из файла.
 
+    Повторная загрузка неизменённого файла (по времени изменения) не
+    перечитывает и не валидирует его заново.
+
     Args:
         config_path: Путь к конфигурационному файлу.
 
@@ -20,6 +27,15 @@ def load_config(config_path: str = 'config.ini') -> Dict[str, Any]:
     Raises:
         ConfigError: Если конфигурация невалидна.
     """
+    try:
+        mtime = os.stat(config_path).st_mtime
+    except OSError:
+        raise ConfigError(f"Конфигурационный файл {config_path} не найден")
+
+    cached = _config_cache.get(config_path)
+    if cached is not None and cached[0] == mtime:
+        return dict(cached[1])
+
     config = configparser.ConfigParser()
     if not config.read(config_path):
         raise ConfigError(f"Конфигурационный файл {config_path} не найден")
@@ -30,7 +46,9 @@ def load_config(config_path: str = 'config.ini') -> Dict[str, Any]:
             'cloud_folder': config['DEFAULT']['CloudFolder'],
             'token': config['DEFAULT']['Token'],
             'sync_interval': int(config['DEFAULT'].get('SyncInterval', 60)),
-            'log_file': config['DEFAULT'].get('LogFile', 'sync.log')
+            'requests_per_second': float(config['DEFAULT'].get('RequestsPerSecond', 40)),
+            'log_file': config['DEFAULT'].get('LogFile', 'sync.log'),
+            'state_file': Path(config['DEFAULT'].get('StateFile', '.sync_state.json'))
         }
     except KeyError as e:
         raise ConfigError(f"Отсутствует обязательный параметр: {e}")
@@ -39,5 +57,18 @@ def load_config(config_path: str = 'config.ini') -> Dict[str, Any]:
     if not settings['local_path'].exists():
         raise ConfigError(f"Локальная папка {settings['local_path']} не существует")
 
+    # Относительный путь файла состояния отсчитывается от папки конфигурации, а не от
+    # текущей директории; внутри синхронизируемой папки файл сканировался бы и
+    # загружался в облако, а его перезапись давала бы изменения на каждой проверке
+    state_file = settings['state_file']
+    if not state_file.is_absolute():
+        state_file = Path(os.path.abspath(config_path)).parent / state_file
+    state_file = state_file.resolve()
+    local_path = settings['local_path'].resolve()
+    if state_file == local_path or local_path in state_file.parents:
+        raise ConfigError(f"Файл состояния {state_file} не должен находиться внутри папки {local_path}")
+    settings['state_file'] = state_file
+
+    _config_cache[config_path] = (mtime, settings)
     logger.info("Конфигурация успешно загружена")
-    return settings
+    return dict(settings)
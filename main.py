@@ -1,5 +1,6 @@
-import time
-from pathlib import Path
+import asyncio
+import signal
+import threading
 
 from config.settings import load_config
 from cloud_storage.yandex_disk import YandexDiskClient
@@ -9,45 +10,102 @@ from utils.logger import setup_logger
 logger = setup_logger(__name__)
 
 
-def main():
+async def main_async():
+    loop = asyncio.get_running_loop()
+
+    # Сигналы остановки прерывают ожидание следующей проверки сразу, а не через sync_interval.
+    # Синхронизация в рабочем потоке получает запрос через sync_stop и прерывается
+    # на ближайшей операции с облаком
+    stop_event = asyncio.Event()
+    sync_stop = threading.Event()
+    stop_signals = (signal.SIGINT, signal.SIGTERM)
+
+    def request_stop() -> None:
+        logger.info("Получен сигнал остановки, завершаю текущую операцию "
+                    "(повторный сигнал завершит программу немедленно)")
+        stop_event.set()
+        sync_stop.set()
+        # Повторный сигнал обрабатывается стандартно и завершает процесс сразу
+        for stop_sig in stop_signals:
+            try:
+                loop.remove_signal_handler(stop_sig)
+            except NotImplementedError:
+                pass
+            signal.signal(stop_sig, signal.SIG_DFL)
+
+    for sig in stop_signals:
+        try:
+            loop.add_signal_handler(sig, request_stop)
+        except NotImplementedError:
+            # Windows: цикл событий не поддерживает обработчики сигналов. Без своего
+            # обработчика KeyboardInterrupt лишь отменил бы ожидание, а синхронизация
+            # в рабочем потоке продолжилась бы до конца - поэтому запрос остановки
+            # передаётся в цикл событий из обычного обработчика сигнала
+            signal.signal(sig, lambda *_: loop.call_soon_threadsafe(request_stop))
+
+    cloud_client = None
+    synchronizer = None
     try:
         # Загрузка конфигурации
         config = load_config()
 
-        # Инициализация клиента облачного хранилища
-        cloud_client = YandexDiskClient(config['token'], config['cloud_folder'])
+        # Инициализация клиента облачного хранилища (блокирующие сетевые вызовы - в отдельном потоке)
+        cloud_client = await loop.run_in_executor(
+            None, YandexDiskClient, config['token'], config['cloud_folder'], config['requests_per_second']
+        )
 
         # Инициализация синхронизатора
-        synchronizer = FileSynchronizer(Path(config['local_path']), cloud_client)
+        synchronizer = FileSynchronizer(config['local_path'], cloud_client, config['state_file'], sync_stop)
 
         # Первоначальная синхронизация
-        synchronizer.initial_sync()
+        if not stop_event.is_set():
+            await loop.run_in_executor(None, synchronizer.initial_sync)
 
         # Основной цикл синхронизации
-        sync_interval = config.get('sync_interval', 60)  # Интервал по умолчанию - 60 секунд
+        sync_interval = config['sync_interval']
         logger.info(f"Переход в режим периодической синхронизации (интервал: {sync_interval} сек)")
 
-        while True:
+        while not stop_event.is_set():
             try:
                 logger.info("--- Проверка изменений ---")
                 # Проверяем изменения и синхронизируем при необходимости
-                synchronizer.sync()
+                await loop.run_in_executor(None, synchronizer.sync)
                 logger.info(f"Следующая проверка через {sync_interval} секунд...")
             except Exception as e:
+                if stop_event.is_set():
+                    break
                 logger.error(f"Ошибка при синхронизации: {e}")
                 # В случае ошибки продолжаем работу после паузы
                 logger.info(f"Повторная попытка через {sync_interval} секунд...")
 
-            # Ожидание перед следующей проверкой
-            time.sleep(sync_interval)
+            # Ожидание перед следующей проверкой (или сигнала остановки)
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=sync_interval)
+            except asyncio.TimeoutError:
+                pass
+
+        logger.info("Синхронизация остановлена")
 
-    except KeyboardInterrupt:
-        logger.info("Синхронизация остановлена пользователем")
     except Exception as e:
+        if stop_event.is_set():
+            # Прерванная по сигналу синхронизация - штатная остановка, а не сбой
+            logger.info("Синхронизация остановлена")
+            return
         logger.error(f"Критическая ошибка: {e}")
         raise
+    finally:
+        if synchronizer is not None:
+            synchronizer.close()
+        if cloud_client is not None:
+            cloud_client.close()
+
+
+def main():
+    try:
+        asyncio.run(main_async())
+    except KeyboardInterrupt:
+        logger.info("Синхронизация остановлена пользователем")
 
 
 if __name__ == "__main__":
     main()
-    
\ No newline at end of file
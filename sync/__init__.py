@@ -2,5 +2,6 @@ from .core import FileSynchronizer
 from .local_scanner import LocalScanner
 from .cloud_ops import CloudOperations
 from .change_detector import ChangeDetector
+from .models import LocalEntry, CloudEntry
 
-__all__ = ['FileSynchronizer', 'LocalScanner', 'CloudOperations', 'ChangeDetector']
\ No newline at end of file
+__all__ = ['FileSynchronizer', 'LocalScanner', 'CloudOperations', 'ChangeDetector', 'LocalEntry', 'CloudEntry']
\ No newline at end of file
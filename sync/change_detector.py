@@ -1,7 +1,11 @@
-import time
-from pathlib import Path
-from typing import Dict, Tuple, Any, List
+import os
+import posixpath
+from collections import defaultdict
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Dict, Tuple, List, Iterator, Set
 from utils.logger import setup_logger
+from .models import CloudEntry, LocalEntry
 
 logger = setup_logger(__name__)
 
@@ -18,11 +22,11 @@ class ChangeDetector:
         Создает пустые словари для хранения последних известных состояний локальных
         и облачных файлов.
         """
-        self._last_local_state: Dict[str, Tuple[float, int]] = {}
-        self._last_cloud_state: Dict[str, Dict[str, Any]] = {}
+        self._last_local_state: Dict[str, LocalEntry] = {}
+        self._last_cloud_state: Dict[str, CloudEntry] = {}
         self.cloud_client = None  # Будет установлен при вызове process_*_changes
 
-    def check_local_changes(self, current_local: Dict[str, Tuple[float, int]], last_local: Dict[str, Tuple[float, int]]) -> bool:
+    def check_local_changes(self, current_local: Dict[str, LocalEntry], last_local: Dict[str, LocalEntry]) -> bool:
         """Проверяет наличие изменений в локальных файлах по сравнению с последним известным состоянием.
         
         Args:
@@ -35,23 +39,28 @@ class ChangeDetector:
         if not last_local:
             logger.debug("Нет данных о предыдущем состоянии локальных файлов")
             return True
-        added_files = set(current_local.keys()) - set(last_local.keys())
-        removed_files = set(last_local.keys()) - set(current_local.keys())
+        # Обычный случай - ничего не изменилось: сравнение словарей целиком выполняется
+        # на уровне C и не требует обхода в Python
+        if current_local == last_local:
+            return False
+        # Операции над представлениями ключей не копируют словари в промежуточные множества
+        added_files = current_local.keys() - last_local.keys()
         if added_files:
             logger.info(f"Обнаружены новые файлы: {added_files}")
             return True
+        removed_files = last_local.keys() - current_local.keys()
         if removed_files:
             logger.info(f"Обнаружены удаленные файлы: {removed_files}")
             return True
+        # Наборы путей совпадают, поэтому проверка "path in last_local" не нужна
         for path, (mtime, size) in current_local.items():
-            if path in last_local:
-                last_mtime, last_size = last_local[path]
-                if mtime > last_mtime or size != last_size:
-                    logger.info(f"Обнаружены изменения в файле: {path}")
-                    return True
+            last_mtime, last_size = last_local[path]
+            if mtime > last_mtime or size != last_size:
+                logger.info(f"Обнаружены изменения в файле: {path}")
+                return True
         return False
 
-    def check_cloud_changes(self, current_cloud: Dict[str, Dict[str, Any]], last_cloud: Dict[str, Dict[str, Any]]) -> bool:
+    def check_cloud_changes(self, current_cloud: Dict[str, CloudEntry], last_cloud: Dict[str, CloudEntry]) -> bool:
         """Проверяет наличие изменений в облачном хранилище по сравнению с последним известным состоянием.
         
         Args:
@@ -64,17 +73,49 @@ class ChangeDetector:
         if not last_cloud:
             logger.debug("Нет данных о предыдущем состоянии облачных файлов")
             return True
-        added = set(current_cloud.keys()) - set(last_cloud.keys())
-        removed = set(last_cloud.keys()) - set(current_cloud.keys())
+        if current_cloud == last_cloud:
+            return False
+        added = current_cloud.keys() - last_cloud.keys()
+        removed = last_cloud.keys() - current_cloud.keys()
         if added or removed:
             logger.info(f"Изменения в облаке: добавлены {added}, удалены {removed}")
             return True
         for path, item in current_cloud.items():
-            if path in last_cloud and item.get('modified') != last_cloud[path].get('modified'):
+            if item.modified != last_cloud[path].modified:
                 logger.info(f"Изменен файл в облаке: {path}")
                 return True
         return False
 
+    def diff(self, local_files: Dict[str, LocalEntry],
+             cloud_files: Dict[str, CloudEntry]) -> Tuple[List[str], List[str], List[str]]:
+        """Сравнивает локальные файлы с облачными без учёта предыдущего состояния.
+
+        Файл считается изменённым, если размеры не совпадают или локальная копия
+        изменена позже облачной. Оба времени сравниваются как UTC timestamp; если
+        время изменения в облаке неизвестно, файл тоже считается изменённым.
+
+        Args:
+            local_files: Состояние локальных файлов (путь -> (время модификации, размер))
+            cloud_files: Состояние облачных файлов (путь -> метаданные)
+
+        Returns:
+            Кортеж списков относительных путей (загрузить, удалить из облака, обновить)
+        """
+        to_upload = list(local_files.keys() - cloud_files.keys())
+        to_delete = list(cloud_files.keys() - local_files.keys())
+        to_update = []
+        for path in local_files.keys() & cloud_files.keys():
+            local_mtime, local_size = local_files[path]
+            cloud_item = cloud_files[path]
+            if local_size != cloud_item.size:
+                to_update.append(path)
+                continue
+            # _parse_cloud_time учитывает смещение зоны из строки облака, поэтому сравнение
+            # не зависит от часового пояса хоста; 0.0 (время неизвестно) всегда меньше mtime
+            if local_mtime > self._parse_cloud_time(cloud_item.modified):
+                to_update.append(path)
+        return to_upload, to_delete, to_update
+
     def process_local_changes(self, current_local, current_cloud, last_local, local_path, cloud_ops, cloud_client):
         """Обрабатывает изменения в локальных файлах, синхронизируя их с облачным хранилищем.
         
@@ -93,39 +134,39 @@ class ChangeDetector:
             cloud_client: Клиент для работы с облачным хранилищем
         """
         self.cloud_client = cloud_client
+        root = os.fspath(local_path)
         current_local_set = set(current_local.keys())
         current_cloud_set = set(current_cloud.keys())
         last_local_set = set(last_local.keys()) if last_local else set()
-        renamed_pairs = self._find_renamed_files(current_local, current_cloud, last_local, local_path)
+        renamed_pairs = self._find_renamed_files(current_local, last_local,
+                                                 current_local_set, current_cloud_set, last_local_set)
         folder_renames = self._find_renamed_folders(current_local, current_cloud, last_local)
         
         processed_files = set()
         
         # 1. Переименование папок
         if folder_renames:
-            # Сортируем по уровню вложенности (больше '/' = глубже)
-            folder_renames.sort(key=lambda x: -x[0].count('/'))
+            # Сортируем по уровню вложенности (больше '/' = глубже); глубина считается один раз на папку
+            decorated = [(-old.count('/'), old, new) for old, new in folder_renames]
+            decorated.sort()
+            folder_renames = [(old, new) for _, old, new in decorated]
             
             for old_folder, new_folder in folder_renames:
                 try:
-                    time.sleep(1)  # Небольшая задержка между операциями
                     self._process_folder_rename(old_folder, new_folder, current_cloud, cloud_client, local_path)
                 except Exception as e:
                     logger.error(f"Ошибка переименования папки {old_folder} -> {new_folder}: {e}")
-                    
-        time.sleep(5)  
-        
+
         # 2. Переименование файлов          
         if renamed_pairs:    
             for old_name, new_name in renamed_pairs:
                 try:
-                    time.sleep(1)
                     if self._try_rename_cloud_file(old_name, new_name, cloud_client):
                         logger.info(f"Файл переименован в облаке: {old_name} -> {new_name}")
                     else:
-                        cloud_client.load(local_path / new_name, new_name)
+                        cloud_client.load(os.path.join(root, new_name), new_name)
                         if old_name in current_cloud:
-                            cloud_client.delete(current_cloud[old_name]['path'])
+                            cloud_client.delete(current_cloud[old_name].path)
                         logger.info(f"Файл перезагружен с новым именем: {old_name} -> {new_name}")
                 except Exception as e:
                     logger.error(f"Ошибка обработки переименования {old_name} -> {new_name}: {e}")
@@ -134,26 +175,33 @@ class ChangeDetector:
             processed_files.update({old_name for old_name, _ in renamed_pairs})    
 
         # 3. Новые и изменённые файлы
+        uploads = []
         for rel_path in current_local_set - processed_files:
-            file_path = local_path / rel_path
             if rel_path not in current_cloud_set:
-                cloud_client.load(file_path, rel_path)
-                logger.info(f"Загружен новый файл: {rel_path}")
+                uploads.append((rel_path, f"Загружен новый файл: {rel_path}"))
             else:
                 local_mtime, local_size = current_local[rel_path]
                 cloud_item = current_cloud[rel_path]
-                cloud_mtime = self._parse_cloud_time(cloud_item['modified'])
+                cloud_mtime = self._parse_cloud_time(cloud_item.modified)
                 if rel_path in last_local_set and (local_mtime > last_local[rel_path][0] or local_size != last_local[rel_path][1]):
-                    cloud_client.load(file_path, rel_path)
-                    logger.info(f"Обновлён файл: {rel_path}")
+                    uploads.append((rel_path, f"Обновлён файл: {rel_path}"))
                 elif local_mtime > cloud_mtime:
-                    cloud_client.load(file_path, rel_path)
-                    logger.info(f"Обновлён файл (по сравнению с облаком): {rel_path}")
+                    uploads.append((rel_path, f"Обновлён файл (по сравнению с облаком): {rel_path}"))
 
         # 4. Удалённые файлы
-        for rel_path in current_cloud_set - current_local_set - processed_files:
-            cloud_client.delete(current_cloud[rel_path]['path'])
-            logger.info(f"Удалён файл из облака: {rel_path}")
+        deletions = [
+            (current_cloud[rel_path].path, f"Удалён файл из облака: {rel_path}")
+            for rel_path in current_cloud_set - current_local_set - processed_files
+        ]
+
+        # Загрузки и удаления выполняются пакетно, параллельно внутри пакета
+        errors = cloud_client.bulk_load([(os.path.join(root, rel_path), rel_path) for rel_path, _ in uploads])
+        errors.update(cloud_client.bulk_delete([cloud_path for cloud_path, _ in deletions]))
+        for key, msg in uploads + deletions:
+            if key not in errors:
+                logger.info(msg)
+        if errors:
+            raise next(iter(errors.values()))
 
     def _find_renamed_folders(self, current_local, current_cloud, last_local) -> List[Tuple[str, str]]:
         """Находит переименованные папки путем сравнения структур до и после изменений.
@@ -168,18 +216,12 @@ class ChangeDetector:
         """
         renamed_folders = []
 
-        # Получаем все папки (включая вложенные)
-        last_folders = {
-            '/'.join(f.split('/')[:i + 1])
-            for f in last_local
-            for i in range(len(f.split('/')) - 1)
-        }
+        # Индексы "папка -> файлы внутри неё (на любой глубине)" строятся за один проход
+        local_index = self._index_folders(current_local)
+        cloud_index = self._index_folders(current_cloud)
 
-        current_folders = {
-            '/'.join(f.split('/')[:i + 1])
-            for f in current_local
-            for i in range(len(f.split('/')) - 1)
-        }
+        last_folders = {folder for f in last_local for folder in self._parent_dirs(f)}
+        current_folders = set(local_index)
 
         disappeared_folders = last_folders - current_folders
         appeared_folders = current_folders - last_folders
@@ -187,7 +229,8 @@ class ChangeDetector:
         # Используем копию для итерации
         for old_folder in disappeared_folders:
             for new_folder in list(appeared_folders):  # Итерируем по копии
-                if self._compare_folder_structures(old_folder, new_folder, current_local, current_cloud):
+                if self._compare_folder_structures(old_folder, new_folder, current_local, current_cloud,
+                                                   local_index, cloud_index):
                     renamed_folders.append((old_folder, new_folder))
                     appeared_folders.remove(new_folder)  # Удаляем из оригинального множества
                     break
@@ -196,7 +239,39 @@ class ChangeDetector:
         return renamed_folders
 
     @staticmethod
-    def _compare_folder_structures(old_folder: str, new_folder: str, current_local, current_cloud) -> bool:
+    def _parent_dirs(path: str) -> Iterator[str]:
+        """Перечисляет все родительские папки пути, от ближайшей к корню.
+
+        Args:
+            path: Относительный путь к файлу (с '/' как разделителем)
+
+        Yields:
+            str: Относительный путь родительской папки
+        """
+        folder = posixpath.dirname(path)
+        while folder:
+            yield folder
+            folder = posixpath.dirname(folder)
+
+    @classmethod
+    def _index_folders(cls, paths) -> Dict[str, List[str]]:
+        """Строит индекс папок по списку путей к файлам.
+
+        Args:
+            paths: Относительные пути к файлам
+
+        Returns:
+            Dict[str, List[str]]: Словарь (папка -> пути файлов внутри неё, включая вложенные)
+        """
+        index = defaultdict(list)
+        for path in paths:
+            for folder in cls._parent_dirs(path):
+                index[folder].append(path)
+        return index
+
+    @staticmethod
+    def _compare_folder_structures(old_folder: str, new_folder: str, current_local, current_cloud,
+                                   local_index, cloud_index) -> bool:
         """Сравнивает структуры двух папок для определения возможного переименования.
         
         Args:
@@ -204,30 +279,26 @@ class ChangeDetector:
             new_folder: Путь к новой папке
             current_local: Текущее состояние локальных файлов
             current_cloud: Текущее состояние облачных файлов
+            local_index: Индекс папок по локальным файлам
+            cloud_index: Индекс папок по облачным файлам
             
         Returns:
             bool: True если структуры папок идентичны (кроме имени), иначе False
         """
-        old_files = {
-            f[len(old_folder) + 1:]: d
-            for f, d in current_cloud.items()
-            if f.startswith(old_folder + '/')
-        }
-        new_files = {
-            f[len(new_folder) + 1:]: (mtime, size)
-            for f, (mtime, size) in current_local.items()
-            if f.startswith(new_folder + '/')
-        }
+        old_files = cloud_index.get(old_folder, [])
+        new_files = local_index.get(new_folder, [])
 
         # Быстрая проверка по количеству файлов
         if len(old_files) != len(new_files):
             return False
 
         # Проверяем совпадение файлов
-        for rel_path, (local_mtime, local_size) in new_files.items():
-            if rel_path not in old_files:
+        old_sizes = {f[len(old_folder) + 1:]: current_cloud[f].size for f in old_files}
+        for f in new_files:
+            rel_path = f[len(new_folder) + 1:]
+            if rel_path not in old_sizes:
                 return False
-            if local_size != old_files[rel_path]['size']:
+            if current_local[f].size != old_sizes[rel_path]:
                 return False
 
         return True
@@ -255,71 +326,40 @@ class ChangeDetector:
             logger.error(f"Ошибка переименования папки {old_folder} -> {new_folder}: {e}")
             raise
 
-    def _find_renamed_files(self, current_local, current_cloud, last_local, local_path) -> List[Tuple[str, str]]:
+    def _find_renamed_files(self, current_local, last_local, current_local_set: Set[str],
+                            current_cloud_set: Set[str], last_local_set: Set[str]) -> List[Tuple[str, str]]:
         """Находит переименованные файлы путем сравнения их идентификаторов.
+
+        Идентификатор файла - кортеж (размер, время модификации). Для новых файлов
+        он берётся из текущего скана, поэтому повторный stat() не нужен.
         
         Args:
             current_local: Текущее состояние локальных файлов
-            current_cloud: Текущее состояние облачных файлов
             last_local: Последнее известное состояние локальных файлов
-            local_path: Локальный путь к синхронизируемой директории
+            current_local_set: Множество путей текущих локальных файлов
+            current_cloud_set: Множество путей текущих облачных файлов
+            last_local_set: Множество путей из последнего известного локального состояния
             
         Returns:
             List[Tuple[str, str]]: Список кортежей (старое_имя, новое_имя)
         """
         renamed_pairs = []
-        current_local_set = set(current_local.keys())
-        current_cloud_set = set(current_cloud.keys())
-        last_local_set = set(last_local.keys()) if last_local else set()
         disappeared_locally = last_local_set - current_local_set
         appeared_locally = current_local_set - last_local_set
-        for old_name in disappeared_locally:
-            if old_name not in current_cloud_set:
-                continue
-            old_file_hash = self._get_file_identifier(old_name, last_local)
-            for new_name in list(appeared_locally):
-                new_file_path = local_path / new_name
-                if not new_file_path.exists():
-                    continue
-                new_file_hash = self._calculate_file_identifier(new_file_path)
-                if old_file_hash == new_file_hash:
-                    renamed_pairs.append((old_name, new_name))
-                    appeared_locally.remove(new_name)
-                    break
+        # Индекс исчезнувших файлов по идентификатору: один проход вместо вложенного цикла
+        disappeared_by_id = {}
+        for old_name in disappeared_locally & current_cloud_set:
+            mtime, size = last_local[old_name]
+            disappeared_by_id[(size, mtime)] = old_name
+        if not disappeared_by_id:
+            return renamed_pairs
+        for new_name in appeared_locally:
+            mtime, size = current_local[new_name]
+            old_name = disappeared_by_id.pop((size, mtime), None)
+            if old_name is not None:
+                renamed_pairs.append((old_name, new_name))
         return renamed_pairs
 
-    @staticmethod
-    def _get_file_identifier(rel_path: str, last_local) -> str:
-        """Генерирует идентификатор файла на основе его метаданных.
-        
-        Args:
-            rel_path: Относительный путь к файлу
-            last_local: Последнее известное состояние локальных файлов
-            
-        Returns:
-            str: Идентификатор файла в формате "размер-время_модификации"
-        """
-        if rel_path in last_local:
-            mtime, size = last_local[rel_path]
-            return f"{size}-{mtime}"
-        return ""
-
-    @staticmethod
-    def _calculate_file_identifier(file_path: Path) -> str:
-        """Вычисляет идентификатор для локального файла.
-        
-        Args:
-            file_path: Полный путь к файлу
-            
-        Returns:
-            str: Идентификатор файла в формате "размер-время_модификации"
-        """
-        try:
-            stat = file_path.stat()
-            return f"{stat.st_size}-{stat.st_mtime}"
-        except OSError:
-            return ""
-
     def _try_rename_cloud_file(self, old_name: str, new_name: str, cloud_client) -> bool:
         """Пытается переименовать файл в облачном хранилище.
         
@@ -342,8 +382,11 @@ class ChangeDetector:
         return False
 
     @staticmethod
+    @lru_cache(maxsize=8192)
     def _parse_cloud_time(timestr: str) -> float:
         """Преобразует строку времени из облачного хранилища в timestamp.
+
+        Результаты кэшируются: одни и те же метки времени повторяются от цикла к циклу.
         
         Args:
             timestr: Строка с временем в формате ISO (например, '2023-04-27T19:41:25+00:00')
@@ -352,9 +395,13 @@ class ChangeDetector:
             float: Временная метка в секундах с начала эпохи
         """
         try:
-            from datetime import datetime
-            dt = datetime.strptime(timestr[:19], "%Y-%m-%dT%H:%M:%S")
-            return dt.timestamp()
-        except Exception:
+            # Разбирается вся строка вместе со смещением зоны, иначе время было бы
+            # прочитано как местное и сдвинуто на смещение часового пояса хоста
+            if timestr.endswith('Z'):
+                timestr = timestr[:-1] + '+00:00'
+            dt = datetime.fromisoformat(timestr)
+        except (AttributeError, TypeError, ValueError):
             return 0.0
-        
\ No newline at end of file
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        return dt.timestamp()
@@ -1,8 +1,15 @@
+import logging
+import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import groupby
 from pathlib import Path
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Dict, Any, Callable, List, Optional, Set, Tuple
 from utils.logger import setup_logger
 from utils.exceptions import SyncError
+from utils.retry import backoff_delay
+from .models import CloudEntry, LocalEntry
 
 logger = setup_logger(__name__)
 
@@ -12,67 +19,144 @@ class CloudOperations:
     Обеспечивает сканирование, загрузку, удаление файлов и другие операции
     синхронизации между локальной файловой системой и облачным хранилищем.
     """
+
+    # Максимальный интервал между проверками при ожидании отражения изменений в облаке (сек)
+    MAX_POLL_INTERVAL = 5.0
+    # Размер буфера чтения файла при загрузке, если клиент не задаёт свой
+    UPLOAD_BUFFER_SIZE = 1024 * 1024
     
-    def __init__(self, cloud_client: Any, local_path: Path):
+    def __init__(self, cloud_client: Any, local_path: Path, max_workers: int = 8,
+                 stop_event: Optional[threading.Event] = None):
         """Инициализация операций с облачным хранилищем.
         
         Args:
             cloud_client: Клиент для работы с облачным хранилищем
             local_path: Локальный путь к синхронизируемой директории
+            max_workers: Максимальное количество одновременных операций с облаком
+            stop_event: Событие запроса остановки; после его установки операции прерываются
         """
         self.cloud_client = cloud_client
         self.local_path = local_path
+        # Строковый путь корня: пути файлов собираются через os.path без создания объектов Path
+        self._root_str = os.fspath(local_path)
         self.cloud_folder = getattr(cloud_client, 'cloud_folder', '')
+        self._upload_buffer_size = getattr(cloud_client, 'UPLOAD_BUFFER_SIZE', self.UPLOAD_BUFFER_SIZE)
+        # Пул потоков создаётся один раз и переиспользуется всеми операциями
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='cloud-ops')
+        # Папки, существующие в облаке по данным последнего сканирования
+        self._known_folders: Set[str] = set()
+        # Результат последнего сканирования облака: (время по time.monotonic(), файлы)
+        self._cloud_cache: Optional[Tuple[float, Dict[str, CloudEntry]]] = None
+        self._stop_event = stop_event or threading.Event()
+
+    def close(self) -> None:
+        """Останавливает пул потоков, дожидаясь завершения начатых операций."""
+        self._executor.shutdown(wait=True)
+
+    def check_stopped(self) -> None:
+        """Прерывает текущую операцию, если запрошена остановка.
+
+        Raises:
+            SyncError: Если установлено событие остановки
+        """
+        if self._stop_event.is_set():
+            raise SyncError("Синхронизация прервана по запросу остановки")
+
+    def _sleep(self, seconds: float) -> None:
+        """Ожидает указанное время, просыпаясь сразу при запросе остановки.
+
+        Raises:
+            SyncError: Если во время ожидания запрошена остановка
+        """
+        self._stop_event.wait(seconds)
+        self.check_stopped()
 
-    def scan_cloud_files_with_retry(self, max_retries: int = 3) -> Optional[Dict[str, Dict[str, Any]]]:
+    def invalidate_cloud_cache(self) -> None:
+        """Сбрасывает сохранённый результат сканирования облака после изменений в нём."""
+        self._cloud_cache = None
+
+    def scan_cloud_files_with_retry(self, max_retries: int = 3,
+                                    max_age: float = 0.0) -> Optional[Dict[str, CloudEntry]]:
         """Сканирует файлы в облачном хранилище с возможностью повторных попыток.
+
+        Если последнее сканирование выполнено не раньше max_age секунд назад и облако
+        с тех пор не изменялось через этот объект, повторный обход не выполняется.
         
         Args:
             max_retries: Максимальное количество попыток сканирования
+            max_age: Допустимый возраст сохранённого результата сканирования (сек)
             
         Returns:
-            Словарь с информацией о файлах в облаке (путь -> метаданные)
+            Словарь с информацией о файлах в облаке (путь -> CloudEntry)
             
         Raises:
             Exception: Если не удалось сканировать после всех попыток
         """
+        cache = self._cloud_cache
+        if cache is not None and time.monotonic() - cache[0] < max_age:
+            return cache[1]
         for attempt in range(max_retries):
+            self.check_stopped()
             try:
                 cloud_files = {}
+                folders = set()
                 items = self.cloud_client.get_recursive_info()
+                # Префикс и уровень логирования вычисляются один раз, а не на каждый файл
+                prefix = f"disk:/{self.cloud_folder}/"
+                prefix_len = len(prefix)
+                debug = logger.isEnabledFor(logging.DEBUG)
                 for item in items:
                     if item['type'] == 'file':
-                        path = item['path'].replace(f"disk:/{self.cloud_folder}/", "")
-                        cloud_files[path] = item
-                        logger.debug(f"Найден облачный файл: {path}")
+                        path = item['path']
+                        if path.startswith(prefix):
+                            path = path[prefix_len:]
+                        # Из JSON-объекта листинга сохраняются только нужные поля
+                        cloud_files[path] = CloudEntry(item['path'], item.get('modified'), item.get('size'))
+                        if debug:
+                            logger.debug("Найден облачный файл: %s", path)
+                    elif item['type'] == 'dir' and item['path'].startswith(prefix):
+                        folders.add(item['path'][prefix_len:])
+                self._known_folders = folders
+                self._cloud_cache = (time.monotonic(), cloud_files)
                 return cloud_files
             except Exception:
                 if attempt == max_retries - 1:
                     logger.error(f"Не удалось сканировать облако после {max_retries} попыток")
                     raise
-                wait_time = 5 * (attempt + 1)
-                logger.warning(f"Ошибка сканирования облака (попытка {attempt + 1}), ждем {wait_time} сек...")
-                time.sleep(wait_time)
+                wait_time = backoff_delay(attempt, base=5)
+                logger.warning(f"Ошибка сканирования облака (попытка {attempt + 1}), ждем {wait_time:.1f} сек...")
+                self._sleep(wait_time)
+
+    def clean_cloud_storage(self, cloud_files: Dict[str, CloudEntry], timeout: float = 30.0) -> None:
+        """Удаляет из облачного хранилища переданные файлы.
 
-    def clean_cloud_storage(self, cloud_files: Dict[str, Dict[str, Any]]) -> None:
-        """Полностью очищает облачное хранилище от файлов.
+        Файлы удаляются параллельно, после чего выполняется ожидание, пока
+        удаление не отразится в листинге облака.
         
         Args:
             cloud_files: Словарь с информацией о файлах для удаления
+            timeout: Максимальное время ожидания отражения удаления в облаке (сек)
             
         Raises:
             SyncError: Если произошла ошибка при удалении файлов
         """
+        self.check_stopped()
         total_files = len(cloud_files)
         logger.info(f"Начинаю удаление {total_files} файлов из облака")
+        errors = self.cloud_client.bulk_delete([item.path for item in cloud_files.values()])
+        self.invalidate_cloud_cache()
+        failed = []
         for i, (rel_path, item) in enumerate(cloud_files.items(), 1):
-            try:
-                self.cloud_client.delete(item['path'])
-                logger.info(f"[{i}/{total_files}] Удален файл: {rel_path}")
-            except Exception as e:
-                logger.error(f"Ошибка при удалении файла {rel_path}: {e}")
-                raise SyncError(f"Не удалось очистить облако: ошибка при удалении {rel_path}")
-        time.sleep(10)
+            if item.path in errors:
+                logger.error("Ошибка при удалении файла %s: %s", rel_path, errors[item.path])
+                failed.append(rel_path)
+            else:
+                logger.info("[%d/%d] Удален файл: %s", i, total_files, rel_path)
+        if failed:
+            raise SyncError(f"Не удалось очистить облако: ошибка при удалении {', '.join(failed)}")
+
+        self._wait_consistency(lambda current: current.keys() & cloud_files.keys(),
+                               "Удаление не отразилось в облаке", timeout)
         logger.info("Очистка облака завершена")
 
     def create_folder_structure(self, file_paths: List[str]) -> None:
@@ -86,32 +170,65 @@ class CloudOperations:
         """
         folders = set()
         for path in file_paths:
-            if '/' in path:
-                parts = path.split('/')[:-1]
-                current_path = ""
-                for part in parts:
-                    current_path = f"{current_path}/{part}" if current_path else part
-                    folders.add(current_path)
-        sorted_folders = sorted(folders, key=lambda x: x.count('/'))
-        for folder in sorted_folders:
-            try:
-                self.cloud_client.create_folder(folder)
-                logger.debug(f"Создана папка: {folder}")
-            except Exception as e:
-                logger.error(f"Ошибка при создании папки {folder}: {e}")
-                raise SyncError(f"Не удалось создать папку {folder}")
+            # Идём от ближайшей родительской папки к корню; если папка уже добавлена,
+            # то и все её родители тоже - дальше можно не проверять
+            i = path.rfind('/')
+            while i > 0:
+                prefix = path[:i]
+                if prefix in folders:
+                    break
+                folders.add(prefix)
+                i = path.rfind('/', 0, i)
+        # Папки, уже известные по последнему сканированию облака, не создаём повторно
+        missing_folders = folders - self._known_folders
+        if len(missing_folders) < len(folders):
+            logger.debug("Пропущено существующих папок: %d", len(folders) - len(missing_folders))
+
+        # Папки одного уровня вложенности не зависят друг от друга и создаются параллельно,
+        # уровни - последовательно, от корня вглубь
+        sorted_folders = sorted(missing_folders, key=lambda x: x.count('/'))
+        if sorted_folders:
+            self.invalidate_cloud_cache()
+        for _, level in groupby(sorted_folders, key=lambda x: x.count('/')):
+            self.check_stopped()
+            futures = {folder: self._executor.submit(self.cloud_client.create_folder, folder) for folder in level}
+            for folder, future in futures.items():
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.error("Ошибка при создании папки %s: %s", folder, e)
+                    raise SyncError(f"Не удалось создать папку {folder}")
+                self._known_folders.add(folder)
+                logger.debug("Создана папка: %s", folder)
 
-    def upload_all_files(self, local_files: Dict[str, Tuple[float, int]]) -> None:
+    def upload_all_files(self, local_files: Dict[str, LocalEntry]) -> None:
         """Загружает все файлы из локальной директории в облачное хранилище.
+
+        Файлы загружаются параллельно, от больших к меньшим; при первой ошибке
+        ещё не начатые загрузки отменяются.
         
         Args:
             local_files: Словарь с информацией о локальных файлах (путь -> (mtime, size))
+
+        Raises:
+            SyncError: Если не удалось загрузить один из файлов
         """
         total_files = len(local_files)
         logger.info(f"Начинаю загрузку {total_files} файлов в облако")
-        for i, rel_path in enumerate(local_files, 1):
-            self.upload_file(rel_path, max_retries=3, log_progress=(i, total_files))
-        time.sleep(15)
+        # Крупные файлы отправляются первыми, а мелкие заполняют освободившиеся потоки:
+        # так загрузка не ждёт в конце один большой файл
+        order = sorted(local_files, key=lambda rel_path: local_files[rel_path].size, reverse=True)
+        futures = [
+            self._executor.submit(self.upload_file, rel_path, max_retries=3, log_progress=(i, total_files))
+            for i, rel_path in enumerate(order, 1)
+        ]
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception:
+                for pending in futures:
+                    pending.cancel()
+                raise
 
     def upload_file(self, rel_path: str, is_update: bool = False, max_retries: int = 3,
                    log_progress: Optional[Tuple[int, int]] = None) -> None:
@@ -126,58 +243,95 @@ class CloudOperations:
         Raises:
             SyncError: Если файл не существует или произошла ошибка загрузки
         """
-        file_path = self.local_path / rel_path
-        if not file_path.exists():
+        file_path = os.path.join(self._root_str, rel_path)
+        try:
+            current_size = os.stat(file_path).st_size
+        except FileNotFoundError:
             logger.warning(f"Локальный файл {rel_path} не существует, пропускаем загрузку")
             return
-
-        try:
-            stat = file_path.stat()
-            current_mtime, current_size = stat.st_mtime, stat.st_size
         except OSError as e:
             logger.error(f"Не удалось получить метаданные файла {rel_path}: {e}")
             raise SyncError(f"Ошибка чтения файла {rel_path}")
 
+        action = "Обновление" if is_update else "Загрузка"
         for attempt in range(max_retries):
+            # Проверка вне try: запрос остановки не должен считаться ошибкой загрузки для повтора
+            self.check_stopped()
             try:
-                if is_update:
-                    log_msg = f"Обновление файла {rel_path}"
-                    if log_progress:
-                        log_msg = f"[{log_progress[0]}/{log_progress[1]}] {log_msg}"
-                    logger.info(log_msg)
-                    self.cloud_client.reload(file_path, rel_path)
-                else:
-                    log_msg = f"Загрузка файла {rel_path}"
-                    if log_progress:
-                        log_msg = f"[{log_progress[0]}/{log_progress[1]}] {log_msg}"
-                    logger.info(log_msg)
-                    self.cloud_client.load(file_path, rel_path)
+                log_msg = f"{action} файла {rel_path}"
+                if log_progress:
+                    log_msg = f"[{log_progress[0]}/{log_progress[1]}] {log_msg}"
+                logger.info(log_msg)
+                # Файл передаётся клиенту открытым потоком и читается блоками по мере отправки;
+                # при повторной попытке открывается заново, чтобы чтение началось с начала
+                with open(file_path, 'rb', buffering=self._upload_buffer_size) as f:
+                    self.cloud_client.load_stream(f, rel_path, size=current_size)
+                self.invalidate_cloud_cache()
                 return
             except Exception as e:
                 if attempt == max_retries - 1:
                     logger.error(f"Не удалось загрузить файл {rel_path} после {max_retries} попыток")
                     raise SyncError(f"Ошибка загрузки файла {rel_path}: {e}")
-                wait_time = 2 * (attempt + 1)
-                logger.warning(f"Ошибка загрузки {rel_path}, попытка {attempt + 1}. Ждем {wait_time} сек...")
-                time.sleep(wait_time)
+                wait_time = backoff_delay(attempt, base=2)
+                logger.warning(f"Ошибка загрузки {rel_path}, попытка {attempt + 1}. Ждем {wait_time:.1f} сек...")
+                self._sleep(wait_time)
 
-    def validate_sync(self, local_files: Dict[str, Tuple[float, int]]) -> None:
+    def validate_sync(self, local_files: Dict[str, LocalEntry], timeout: float = 30.0) -> None:
         """Проверяет результаты синхронизации, сравнивая локальные и облачные файлы.
+
+        Облако может отражать загруженные файлы с задержкой, поэтому проверка
+        повторяется, пока все файлы не появятся или не истечёт время ожидания.
         
         Args:
             local_files: Словарь с информацией о локальных файлах
+            timeout: Максимальное время ожидания появления файлов в облаке (сек)
             
         Raises:
             SyncError: Если обнаружены расхождения между локальными и облачными файлами
         """
         logger.info("Проверка результатов синхронизации...")
-        cloud_files = self.scan_cloud_files_with_retry(max_retries=5)
-        logger.info(f"Локальные файлы: {set(local_files.keys())}")
-        logger.info(f"Облачные файлы: {set(cloud_files.keys())}")
-        missing_files = set(local_files.keys()) - set(cloud_files.keys())
-        if missing_files:
-            for file in missing_files:
-                logger.error(f"Файл отсутствует в облаке: {file}")
-            raise SyncError(f"Не удалось загрузить {len(missing_files)} файлов в облако")
+        # Пять попыток сканирования, как и до перехода на общее ожидание: проверка
+        # завершает первоначальную синхронизацию, и разовый сбой листинга не должен её провалить
+        cloud_files = self._wait_consistency(lambda current: local_files.keys() - current.keys(),
+                                             "Файл отсутствует в облаке", timeout, max_retries=5)
+        logger.debug("Локальных файлов: %d, облачных файлов: %d", len(local_files), len(cloud_files))
         logger.info("Все файлы успешно синхронизированы")
-        
\ No newline at end of file
+
+    def _wait_consistency(self, pending: Callable[[Dict[str, CloudEntry]], Set[str]],
+                          error_message: str, timeout: float = 30.0, initial: float = 0.5,
+                          max_retries: int = 3) -> Dict[str, CloudEntry]:
+        """Ожидает, пока изменения отразятся в листинге облака.
+
+        Облако проверяется сразу, затем с растущим интервалом: от initial
+        до MAX_POLL_INTERVAL сек.
+
+        Args:
+            pending: Функция, возвращающая по текущему состоянию облака пути, которые ещё не отразились
+            error_message: Сообщение для логирования каждого неотразившегося пути
+            timeout: Максимальное время ожидания (сек)
+            initial: Интервал перед первой повторной проверкой (сек)
+            max_retries: Количество попыток каждого сканирования облака
+
+        Returns:
+            Состояние облачных файлов по последнему сканированию
+
+        Raises:
+            SyncError: Если за отведённое время изменения не отразились в облаке
+        """
+        delay = initial
+        deadline = time.monotonic() + timeout
+        while True:
+            cloud_files = self.scan_cloud_files_with_retry(max_retries=max_retries)
+            remaining = pending(cloud_files)
+            if not remaining:
+                return cloud_files
+            left = deadline - time.monotonic()
+            if left <= 0:
+                break
+            logger.info("В облаке пока не отразилось %d файлов, повторная проверка через %.1f сек...",
+                        len(remaining), min(delay, left))
+            self._sleep(min(delay, left))
+            delay = min(delay * 1.5, self.MAX_POLL_INTERVAL)
+        for path in remaining:
+            logger.error("%s: %s", error_message, path)
+        raise SyncError(f"Изменения {len(remaining)} файлов не отразились в облаке за {timeout} сек")
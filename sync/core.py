@@ -1,9 +1,13 @@
+import json
+import os
+import threading
 from pathlib import Path
-from typing import Dict, Tuple, Any
+from typing import Dict, Any, Optional
 
 from .local_scanner import LocalScanner
 from .cloud_ops import CloudOperations
 from .change_detector import ChangeDetector
+from .models import CloudEntry, LocalEntry
 from utils.logger import setup_logger
 from utils.exceptions import SyncError
 
@@ -19,37 +23,63 @@ class FileSynchronizer:
     - Обработку ошибок и валидацию результатов
     """
 
-    def __init__(self, local_path: Path, cloud_client: Any):
+    # Насколько свежим должно быть сканирование облака, чтобы использовать его повторно (сек)
+    CLOUD_SCAN_MAX_AGE = 5.0
+
+    def __init__(self, local_path: Path, cloud_client: Any, state_file: Optional[Path] = None,
+                 stop_event: Optional[threading.Event] = None):
         """Инициализация синхронизатора.
         
         Args:
             local_path: Путь к локальной директории для синхронизации
             cloud_client: Клиент для работы с облачным хранилищем
+            state_file: Файл для сохранения состояния между запусками (None - не сохранять)
+            stop_event: Событие запроса остановки; после его установки синхронизация
+                        прерывается на ближайшей операции с облаком
         """
         self.local_path = local_path
-        self.cloud_ops = CloudOperations(cloud_client, local_path)
+        self.state_file = state_file
+        self.cloud_ops = CloudOperations(cloud_client, local_path, stop_event=stop_event)
         self.local_scanner = LocalScanner(local_path)
         self.detector = ChangeDetector()
-        self._last_local_state: Dict[str, Tuple[float, int]] = {}
-        self._last_cloud_state: Dict[str, Dict[str, Any]] = {}
+        self._last_local_state: Dict[str, LocalEntry] = {}
+        self._last_cloud_state: Dict[str, CloudEntry] = {}
         logger.info(f"Инициализирован синхронизатор для папки {local_path}")
 
+    def close(self) -> None:
+        """Освобождает ресурсы синхронизатора (пул потоков облачных операций)."""
+        self.cloud_ops.close()
+
     def initial_sync(self) -> None:
         """Выполняет первоначальную синхронизацию между локальной и облачной файловыми системами.
         
+        Если сохранено состояние предыдущего запуска и оно совпадает с облаком,
+        вместо полной синхронизации выполняется инкрементальная.
+
         Процесс состоит из следующих этапов:
         1. Сканирование локальных файлов
-        2. Сканирование облачных файлов
-        3. Очистка облачного хранилища (если там есть файлы)
-        4. Создание структуры папок в облаке
-        5. Загрузка всех файлов в облако
+        2. Сканирование облачных файлов и сравнение с локальными
+        3. Удаление из облака файлов, которых нет локально
+        4. Создание недостающих папок в облаке
+        5. Загрузка новых и изменённых файлов в облако
         6. Валидация результатов синхронизации
+
+        Если облако уже совпадает с локальной папкой, этапы 3-6 пропускаются.
         
         Raises:
             SyncError: Если произошла ошибка на любом из этапов синхронизации
         """
         logger.info("=== Начало первоначальной синхронизации ===")
         try:
+            if self._load_state():
+                if self._state_matches_cloud(self.cloud_ops.scan_cloud_files_with_retry()):
+                    logger.info("Найдено сохранённое состояние - выполняю инкрементальную синхронизацию")
+                    self.sync(cloud_max_age=self.CLOUD_SCAN_MAX_AGE)
+                    return
+                logger.info("Сохранённое состояние не совпадает с облаком - выполняю полную синхронизацию")
+                self._last_local_state = {}
+                self._last_cloud_state = {}
+
             logger.info("Этап 1: Сканирование локальных файлов")
             local_files = self.local_scanner.scan_local_files()
             if not local_files:
@@ -57,29 +87,44 @@ class FileSynchronizer:
                 return
 
             logger.info("Этап 2: Сканирование облачных файлов")
-            cloud_files = self.cloud_ops.scan_cloud_files_with_retry(max_retries=5)
+            cloud_files = self.cloud_ops.scan_cloud_files_with_retry(max_retries=5, max_age=self.CLOUD_SCAN_MAX_AGE)
 
-            if cloud_files:
-                logger.info("Этап 3: Очистка облачного хранилища")
-                self.cloud_ops.clean_cloud_storage(cloud_files)
+            to_upload, to_delete, to_update = self.detector.diff(local_files, cloud_files)
+            if not (to_upload or to_delete or to_update):
+                logger.info("Облако уже совпадает с локальной папкой - загрузка не требуется")
+                self._last_local_state = local_files
+                self._last_cloud_state = cloud_files
+                self._save_state()
+                logger.info("=== Первоначальная синхронизация успешно завершена ===")
+                return
+            logger.info(
+                f"Расхождения с облаком: новых файлов {len(to_upload)}, "
+                f"изменённых {len(to_update)}, лишних в облаке {len(to_delete)}"
+            )
+
+            if to_delete:
+                logger.info("Этап 3: Удаление лишних файлов из облака")
+                self.cloud_ops.clean_cloud_storage({path: cloud_files[path] for path in to_delete})
 
             logger.info("Этап 4: Создание структуры папок")
-            self.cloud_ops.create_folder_structure(list(local_files.keys()))
+            self.cloud_ops.create_folder_structure(to_upload)
 
             logger.info("Этап 5: Загрузка файлов в облако")
-            self.cloud_ops.upload_all_files(local_files)
+            self.cloud_ops.upload_all_files({path: local_files[path] for path in to_upload + to_update})
 
             logger.info("Этап 6: Валидация синхронизации")
             self.cloud_ops.validate_sync(local_files)
 
             self._last_local_state = local_files
-            self._last_cloud_state = self.cloud_ops.scan_cloud_files_with_retry()
+            # Проверка синхронизации только что просканировала облако - повторный обход не нужен
+            self._last_cloud_state = self.cloud_ops.scan_cloud_files_with_retry(max_age=self.CLOUD_SCAN_MAX_AGE)
+            self._save_state()
             logger.info("=== Первоначальная синхронизация успешно завершена ===")
         except Exception as e:
             logger.error(f"Ошибка при первоначальной синхронизации: {e}")
             raise SyncError(f"Ошибка при первоначальной синхронизации: {e}")
 
-    def sync(self) -> None:
+    def sync(self, cloud_max_age: float = 0.0) -> None:
         """Выполняет инкрементальную синхронизацию, обрабатывая только изменения.
         
         Процесс работы:
@@ -87,6 +132,10 @@ class FileSynchronizer:
         2. Сравнение с предыдущим состоянием для обнаружения изменений
         3. Обработка изменений (если они обнаружены)
         4. Обновление информации о последнем состоянии
+
+        Args:
+            cloud_max_age: Допустимый возраст последнего сканирования облака (сек);
+                           по умолчанию облако сканируется заново
         
         Raises:
             SyncError: Если произошла ошибка в процессе синхронизации
@@ -94,7 +143,7 @@ class FileSynchronizer:
         logger.info("Проверка изменений...")
         try:
             current_local = self.local_scanner.scan_local_files()
-            current_cloud = self.cloud_ops.scan_cloud_files_with_retry()
+            current_cloud = self.cloud_ops.scan_cloud_files_with_retry(max_age=cloud_max_age)
             local_changes = self.detector.check_local_changes(current_local, self._last_local_state)
             cloud_changes = self.detector.check_cloud_changes(current_cloud, self._last_cloud_state)
             if not local_changes and not cloud_changes:
@@ -103,14 +152,72 @@ class FileSynchronizer:
             logger.info("Обнаружены изменения. Начинаю синхронизацию...")
             if local_changes:
                 logger.info("Обнаружены локальные изменения")
+                self.cloud_ops.check_stopped()
                 self.detector.process_local_changes(
                     current_local, current_cloud, self._last_local_state,
                     self.local_path, self.cloud_ops, self.cloud_ops.cloud_client
                 )
+                # Изменения вносились в облако напрямую через клиент, минуя кэш сканирования
+                self.cloud_ops.invalidate_cloud_cache()
+                # Запоминаем состояние облака уже после внесённых изменений
+                current_cloud = self.cloud_ops.scan_cloud_files_with_retry()
             self._last_local_state = current_local
             self._last_cloud_state = current_cloud
+            self._save_state()
             logger.info("Синхронизация завершена")
         except Exception as e:
             logger.error(f"Ошибка синхронизации: {e}")
             raise SyncError(f"Ошибка синхронизации: {e}")
-        
\ No newline at end of file
+
+    def _load_state(self) -> bool:
+        """Загружает сохранённое состояние последней синхронизации.
+
+        Returns:
+            bool: True если состояние загружено и относится к текущим папкам, иначе False
+        """
+        if self.state_file is None or not self.state_file.exists():
+            return False
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data['local_path'] != str(self.local_path) or data['cloud_folder'] != self.cloud_ops.cloud_folder:
+                logger.info("Сохранённое состояние относится к другим папкам и будет проигнорировано")
+                return False
+            self._last_local_state = {path: LocalEntry(*value) for path, value in data['local'].items()}
+            self._last_cloud_state = {path: CloudEntry(*value) for path, value in data['cloud'].items()}
+            return True
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Не удалось прочитать сохранённое состояние {self.state_file}: {e}")
+            return False
+
+    def _state_matches_cloud(self, cloud_files: Dict[str, CloudEntry]) -> bool:
+        """Сверяет сохранённое состояние облака с текущим.
+
+        Полный листинг облака уже получен, поэтому сравнивается весь снимок:
+        по сравнению с обходом облака это почти ничего не стоит.
+
+        Args:
+            cloud_files: Текущее состояние облачных файлов
+
+        Returns:
+            bool: True если в облаке те же файлы и ни один не изменялся
+        """
+        return cloud_files == self._last_cloud_state
+
+    def _save_state(self) -> None:
+        """Атомарно сохраняет текущее состояние синхронизации в файл."""
+        if self.state_file is None:
+            return
+        data = {
+            'local_path': str(self.local_path),
+            'cloud_folder': self.cloud_ops.cloud_folder,
+            'local': self._last_local_state,
+            'cloud': self._last_cloud_state
+        }
+        tmp_path = self.state_file.with_name(self.state_file.name + '.tmp')
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.state_file)
+        except OSError as e:
+            logger.warning(f"Не удалось сохранить состояние в {self.state_file}: {e}")
@@ -1,6 +1,9 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, Tuple
+from typing import Dict, List, Optional
 from utils.logger import setup_logger
+from .models import LocalEntry
 
 logger = setup_logger(__name__)
 
@@ -10,16 +13,19 @@ class LocalScanner:
     Обеспечивает обнаружение файлов в указанной директории и сбор их метаданных.
     """
 
-    def __init__(self, local_path: Path):
+    def __init__(self, local_path: Path, max_workers: Optional[int] = None):
         """Инициализация сканера локальных файлов.
         
         Args:
             local_path: Путь к корневой директории для сканирования.
                         Все файлы будут сканироваться относительно этого пути.
+            max_workers: Количество потоков для параллельного обхода поддиректорий
+                         (по умолчанию - удвоенное число процессоров).
         """
         self.local_path = local_path
+        self.max_workers = max_workers or (os.cpu_count() or 1) * 2
 
-    def scan_local_files(self) -> Dict[str, Tuple[float, int]]:
+    def scan_local_files(self) -> Dict[str, LocalEntry]:
         """Сканирует все файлы в указанной директории и возвращает их метаданные.
         
         Проходит рекурсивно по всем поддиректориям, собирая информацию о файлах:
@@ -30,29 +36,83 @@ class LocalScanner:
         Returns:
             Словарь, где:
             - Ключ: относительный путь к файлу (str)
-            - Значение: кортеж (время_модификации, размер_файла)
+            - Значение: LocalEntry (время_модификации, размер_файла)
 
         Пример возвращаемого значения:
             {
-                "file.txt": (1680000000.0, 1024),
-                "folder/file.jpg": (1680000001.0, 2048)
+                "file.txt": LocalEntry(mtime=1680000000.0, size=1024),
+                "folder/file.jpg": LocalEntry(mtime=1680000001.0, size=2048)
             }
 
         Примечания:
             - Пропускает файлы, которые не удалось прочитать
             - Логирует предупреждения для проблемных файлов
             - Возвращает только файлы (директории игнорируются)
+            - Поддиректории верхнего уровня обходятся параллельно
         """
         files = {}
-        for path in self.local_path.rglob('*'):
-            if path.is_file():
-                try:
-                    # Конвертируем путь в POSIX-формат с '/' как разделителем
-                    rel_path = str(path.relative_to(self.local_path)).replace('\\', '/')
-                    stat = path.stat()
-                    files[rel_path] = (stat.st_mtime, stat.st_size)
-                    logger.debug(f"Найден локальный файл: {rel_path}")
-                except OSError as e:
-                    logger.warning(f"Не удалось прочитать файл {path}: {e}")
+        root = os.fspath(self.local_path)
+        # Длина префикса корня вместе с разделителем: относительный путь получается срезом
+        prefix_len = len(os.path.join(root, ''))
+
+        # Файлы корня обрабатываются сразу, поддеревья верхнего уровня - параллельно:
+        # задержки stat() в независимых папках перекрываются (важно для сетевых ФС)
+        subdirs = self._scan_dir(root, prefix_len, files)
+        if subdirs:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(subdirs))) as executor:
+                futures = [executor.submit(self._scan_subtree, subdir, prefix_len) for subdir in subdirs]
+                for future in futures:
+                    files.update(future.result())
+        return files
+
+    def _scan_subtree(self, top: str, prefix_len: int) -> Dict[str, LocalEntry]:
+        """Рекурсивно сканирует поддиректорию.
+
+        Args:
+            top: Путь к поддиректории
+            prefix_len: Длина префикса корневого пути (вместе с разделителем)
+
+        Returns:
+            Словарь (относительный путь -> (время_модификации, размер_файла))
+        """
+        files = {}
+        stack = [top]
+        while stack:
+            stack.extend(self._scan_dir(stack.pop(), prefix_len, files))
         return files
-    
\ No newline at end of file
+
+    @staticmethod
+    def _scan_dir(dir_path: str, prefix_len: int, files: Dict[str, LocalEntry]) -> List[str]:
+        """Сканирует одну директорию без рекурсии.
+
+        os.scandir отдаёт тип записи из readdir, поэтому отдельный stat() нужен только для файлов.
+
+        Args:
+            dir_path: Путь к директории
+            prefix_len: Длина префикса корневого пути (вместе с разделителем)
+            files: Словарь, в который добавляются найденные файлы
+
+        Returns:
+            Список путей вложенных директорий
+        """
+        subdirs = []
+        try:
+            with os.scandir(dir_path) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.is_file():
+                        try:
+                            stat = entry.stat()
+                        except OSError as e:
+                            logger.warning("Не удалось прочитать файл %s: %s", entry.path, e)
+                            continue
+                        rel_path = entry.path[prefix_len:]
+                        if os.sep != '/':
+                            # Конвертируем путь в POSIX-формат с '/' как разделителем
+                            rel_path = rel_path.replace(os.sep, '/')
+                        files[rel_path] = LocalEntry(stat.st_mtime, stat.st_size)
+                        logger.debug("Найден локальный файл: %s", rel_path)
+        except OSError as e:
+            logger.warning("Не удалось прочитать папку %s: %s", dir_path, e)
+        return subdirs
@@ -0,0 +1,23 @@
+from typing import NamedTuple, Optional
+
+
+class LocalEntry(NamedTuple):
+    """Метаданные локального файла.
+
+    Остаётся кортежем (время_модификации, размер_файла), поэтому распаковывается
+    и сравнивается так же, как прежние tuple-значения.
+    """
+
+    mtime: float
+    size: int
+
+
+class CloudEntry(NamedTuple):
+    """Метаданные облачного файла - только поля, нужные для синхронизации.
+
+    Хранится вместо полного JSON-объекта из листинга облака.
+    """
+
+    path: str
+    modified: Optional[str]
+    size: Optional[int]
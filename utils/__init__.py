@@ -1,5 +1,7 @@
 from utils.exceptions import ConfigError, CloudStorageError, SyncError
 from utils.logger import setup_logger
+from utils.rate_limiter import RateLimiter
+from utils.retry import backoff_delay
 
-__all__ = ['ConfigError', 'CloudStorageError', 'SyncError', 'setup_logger']
+__all__ = ['ConfigError', 'CloudStorageError', 'SyncError', 'setup_logger', 'RateLimiter', 'backoff_delay']
 
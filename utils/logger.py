@@ -13,7 +13,13 @@ def setup_logger(name: str) -> Any:
         Настроенный логгер.
     """
     logger = logging.getLogger(name)
+    # Логгер с таким именем уже настроен: повторный обработчик дублировал бы каждую запись
+    if logger.handlers:
+        return logger
+
     logger.setLevel(logging.INFO)
+    # У логгера свой обработчик: не передаём записи родителям, чтобы они не выводились повторно
+    logger.propagate = False
 
     formatter = logging.Formatter(
         '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
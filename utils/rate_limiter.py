@@ -0,0 +1,37 @@
+import threading
+import time
+
+
+class RateLimiter:
+    """Ограничитель частоты запросов по алгоритму token bucket.
+
+    Пропускает запросы без задержки, пока в "ведре" есть токены, и блокирует
+    вызывающий поток только тогда, когда лимит исчерпан. Потокобезопасен.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        """
+        Инициализация ограничителя.
+
+        Args:
+            rate: Скорость пополнения токенов (запросов в секунду).
+            capacity: Максимальное количество токенов (допустимый всплеск запросов).
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Забирает один токен, при необходимости ожидая его появления."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+            self.last_refill = now
+            # Токен резервируется сразу, поэтому следующие вызовы будут ждать дольше
+            wait_time = (1 - self.tokens) / self.rate if self.tokens < 1 else 0.0
+            self.tokens -= 1
+
+        if wait_time > 0:
+            time.sleep(wait_time)
@@ -0,0 +1,19 @@
+import random
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 30.0) -> float:
+    """
+    Вычисляет задержку перед повторной попыткой (экспоненциальная, со случайным разбросом).
+
+    Задержка выбирается равномерно из [0, min(cap, base * 2^attempt)], чтобы
+    параллельные повторы не приходили к API одновременно.
+
+    Args:
+        attempt: Номер неудачной попытки, начиная с 0.
+        base: Базовая задержка в секундах.
+        cap: Максимальная задержка в секундах.
+
+    Returns:
+        Задержка в секундах.
+    """
+    return random.uniform(0, min(cap, base * 2 ** attempt))